@@ -4,22 +4,83 @@ MeltScan CLI - Versão linha de comando
 """
 
 import argparse
+import asyncio
+import errno
+import os
+import random
+import selectors
 import socket
+import struct
 import sys
+import time
 import ipaddress
 import re
+from itertools import chain
 from typing import List
 
 # Try to import scapy
 try:
-    from scapy.all import IP, TCP, UDP, sr1, conf
+    from scapy.all import IP, TCP, UDP, ICMP, RandShort, sr, sr1, conf
     SCAPY_AVAILABLE = True
-except ImportError:
+except Exception:  # não só ImportError: sem libpcap, p.ex., o Scapy levanta OSError
     SCAPY_AVAILABLE = False
 
+# Número máximo de sondagens simultâneas (sockets abertos ao mesmo tempo)
+MAX_CONCURRENCY = 1000
+
+# Pacotes por chamada sr() do Scapy: limita a memória do lote e libera resultados parciais
+_SR_CHUNK = 1024
+
+# Separadores de alvos e de portas, compilados uma única vez
+_SEP_TARGETS = re.compile(r"[\n,;]+")
+_SEP_PORTS = re.compile(r"[\s,;]+")
+
+# Inteiro de 32 bits -> 4 bytes em ordem de rede (para socket.inet_ntoa)
+_PACK_U32 = struct.Struct("!I").pack
+
+# SYN cru: cabeçalhos IPv4 (20 bytes) + TCP (20 bytes) com endereços, portas e
+# checksums zerados; cada sondagem copia o modelo e só preenche esses campos
+_SYN_TEMPLATE = struct.pack(
+    "!BBHHHBBH4s4sHHIIBBHHH",
+    0x45, 0, 40, 0, 0x4000, 64, socket.IPPROTO_TCP, 0, bytes(4), bytes(4),  # IPv4, DF, TTL 64
+    0, 0, 0, 0, 5 << 4, 0x02, 1024, 0, 0,  # TCP, flags=SYN, janela 1024
+)
+_SYN_FIELDS = struct.Struct("!H4s4sHH")  # checksum IP, origem, destino, porta origem, porta destino (offset 10)
+_PORTS = struct.Struct("!HH")  # porta origem, porta destino (TCP/UDP)
+# Envio de IP cru com cabeçalho próprio só é suportado de forma confiável no Linux
+_RAW_SYN = sys.platform.startswith("linux")
+
+# struct linger com l_onoff=1, l_linger=0 (no Windows os campos são u_short)
+_LINGER_RST = struct.pack("HH" if sys.platform == "win32" else "ii", 1, 0)
+
+# Código de erro de connect() -> (estado, info); códigos fora da tabela = "unknown"
+_ERRNO_STATE = {
+    0: ("open", ""),
+    errno.ECONNREFUSED: ("closed", ""),
+    errno.EAGAIN: ("filtered", "Sem resposta"),  # timeout do connect_ex() bloqueante
+    errno.EWOULDBLOCK: ("filtered", "Sem resposta"),
+    errno.ETIMEDOUT: ("filtered", os.strerror(errno.ETIMEDOUT)),
+    errno.EHOSTUNREACH: ("filtered", os.strerror(errno.EHOSTUNREACH)),
+    errno.ENETUNREACH: ("filtered", os.strerror(errno.ENETUNREACH)),
+}
+
+# connect_ex() em socket não bloqueante: conexão ainda em andamento (no Linux,
+# EAGAIN aqui é falta de recursos, não conexão pendente; EWOULDBLOCK só no Windows)
+_CONNECT_PENDING = {errno.EINPROGRESS, errno.EWOULDBLOCK} if sys.platform == "win32" else {errno.EINPROGRESS}
+
+def _expand_ranges(ranges) -> List[int]:
+    """Expande intervalos inteiros (lo, hi) em lista ordenada e sem repetições"""
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return list(chain.from_iterable(range(lo, hi + 1) for lo, hi in merged))
+
 def parse_targets(text: str) -> List[str]:
     """Analisa alvos (IPs ou redes CIDR)"""
-    raw = re.split(r"[\n,;]+", text.strip())
+    raw = _SEP_TARGETS.split(text.strip())
     out = []
     for token in raw:
         t = token.strip()
@@ -28,8 +89,14 @@ def parse_targets(text: str) -> List[str]:
         if "/" in t:
             try:
                 net = ipaddress.ip_network(t, strict=False)
-                for ip in net.hosts():
-                    out.append(str(ip))
+                if net.version == 4:
+                    # Enumera os hosts como inteiros; só converte para texto no final
+                    first, last = int(net.network_address), int(net.broadcast_address)
+                    if net.prefixlen < 31:
+                        first, last = first + 1, last - 1
+                    out.extend(map(socket.inet_ntoa, map(_PACK_U32, range(first, last + 1))))
+                else:
+                    out.extend(str(ip) for ip in net.hosts())
             except Exception:
                 try:
                     ipaddress.ip_address(t)
@@ -38,14 +105,15 @@ def parse_targets(text: str) -> List[str]:
                     continue
         else:
             out.append(t)
-    return out
+    # Redes sobrepostas geram o mesmo host mais de uma vez: remove, mantendo a ordem
+    return list(dict.fromkeys(out))
 
 def parse_ports(text: str) -> List[int]:
     """Analisa portas (lista ou intervalos)"""
     if not text:
         return []
-    parts = re.split(r"[\s,;]+", text.strip())
-    ports = set()
+    parts = _SEP_PORTS.split(text.strip())
+    ranges = []
     for p in parts:
         if not p:
             continue
@@ -54,58 +122,284 @@ def parse_ports(text: str) -> List[int]:
                 a, b = p.split("-")
                 a = int(a)
                 b = int(b)
-                if a < 1:
-                    a = 1
-                if b > 65535:
-                    b = 65535
-                for port in range(min(a, b), max(a, b) + 1):
-                    ports.add(port)
+                lo, hi = max(1, min(a, b)), min(65535, max(a, b))
+                if lo <= hi:
+                    ranges.append((lo, hi))
             except Exception:
                 continue
         else:
             try:
                 val = int(p)
                 if 1 <= val <= 65535:
-                    ports.add(val)
+                    ranges.append((val, val))
             except Exception:
                 continue
-    return sorted(list(ports))
+    return _expand_ranges(ranges)
+
+def _new_probe_socket(timeout):
+    """Socket TCP de sondagem: fecha com RST (sem TIME_WAIT) e aborta conexões presas"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RST)
+    if hasattr(socket, "TCP_USER_TIMEOUT"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, int(timeout * 1000))
+    return sock
+
+def _connect_state(err, detail=None):
+    """Classifica o código de erro de um connect() (retorno do connect_ex, SO_ERROR ou errno de uma exceção)"""
+    return _ERRNO_STATE.get(err) or ("unknown", detail or os.strerror(err))
 
 def tcp_connect_scan(target, port, timeout):
     """Scan TCP por conexão"""
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock = _new_probe_socket(timeout)
         sock.settimeout(timeout)
         result = sock.connect_ex((target, port))
         sock.close()
-        return "open" if result == 0 else "closed", ""
+        return _connect_state(result)
     except Exception as e:
         return "unknown", str(e)
 
-def tcp_syn_scan(target, port, timeout):
-    """Scan TCP SYN (requer Scapy)"""
-    if not SCAPY_AVAILABLE:
-        return tcp_connect_scan(target, port, timeout)
+def _reporter(results, on_result):
+    """Função que grava (alvo, porta) -> (estado, info) em results e repassa cada resultado a on_result"""
+    if on_result is None:
+        return results.__setitem__
+
+    def report(pair, state):
+        results[pair] = state
+        on_result(pair, state)
+    return report
+
+def batch_tcp_connect_scan(targets_ports, timeout, max_inflight=MAX_CONCURRENCY, on_result=None, stop=None):
+    """
+    Scan TCP por conexão em lote: sockets não bloqueantes + um único laço select.
+    Se o threading.Event stop for sinalizado, as conexões em andamento são
+    abandonadas e só os resultados já obtidos são devolvidos.
+    """
+    results = {}
+    report = _reporter(results, on_result)
+    pending = iter(targets_ports)
+    deadlines = {}  # socket -> prazo; ordem de inserção == ordem de expiração
+    sel = selectors.DefaultSelector()
+
+    def launch():
+        while len(deadlines) < max_inflight and not (stop is not None and stop.is_set()):
+            pair = next(pending, None)
+            if pair is None:
+                return
+            sock = _new_probe_socket(timeout)
+            sock.setblocking(False)
+            try:
+                err = sock.connect_ex(pair)
+            except OSError as e:
+                sock.close()
+                report(pair, ("unknown", str(e)))
+                continue
+            if err in _CONNECT_PENDING:
+                sel.register(sock, selectors.EVENT_WRITE, pair)
+                deadlines[sock] = time.monotonic() + timeout
+            else:
+                sock.close()
+                report(pair, _connect_state(err))
+
+    launch()
+    while deadlines:
+        remaining = max(0.0, next(iter(deadlines.values())) - time.monotonic())
+        for key, _ in sel.select(remaining):
+            sock = key.fileobj
+            sel.unregister(sock)
+            del deadlines[sock]
+            report(key.data, _connect_state(sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)))
+            sock.close()
+        now = time.monotonic()
+        while deadlines:
+            sock, deadline = next(iter(deadlines.items()))
+            if deadline > now:
+                break
+            report(sel.get_key(sock).data, ("filtered", "Sem resposta"))
+            sel.unregister(sock)
+            del deadlines[sock]
+            sock.close()
+        launch()
+        if stop is not None and stop.is_set():
+            for sock in deadlines:
+                sock.close()
+            break
+    sel.close()
+    return results
+
+def _sum16(data):
+    """Soma das palavras de 16 bits (big-endian) de data, sem dobrar o carry"""
+    return sum(struct.unpack("!%dH" % (len(data) // 2), data))
+
+def _fold(total):
+    """Dobra o carry de uma soma de 16 bits e devolve o checksum (complemento de um)"""
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+def _source_ip(dst):
+    """Endereço local usado para alcançar dst (connect() UDP não envia nada)"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.connect((dst, 9))
+        return s.getsockname()[0]
+
+def _syn_state(raw):
+    """Classifica a resposta a um SYN direto pelos bytes do pacote IP (flags TCP no offset ihl+13)"""
+    ihl = (raw[0] & 0x0F) * 4
+    if raw[9] == socket.IPPROTO_TCP and len(raw) > ihl + 13:
+        flags = raw[ihl + 13]
+        if flags & 0x12 == 0x12:
+            return "open", ""
+        if flags & 0x14 == 0x14:
+            return "closed", ""
+    return "filtered", "Resposta inesperada"
+
+def tcp_syn_scan_fast(pairs, timeout, on_result=None, stop=None):
+    """Scan SYN em lote com sockets crus, sem montar pacotes pelo Scapy (requer root)"""
+    send_sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_RAW)
     try:
-        conf.verb = 0
-        pkt = IP(dst=target) / TCP(dport=port, flags="S")
-        resp = sr1(pkt, timeout=timeout)
-        if resp is None:
-            return "filtered", "Sem resposta"
-        if resp.haslayer(TCP):
-            flags = resp.getlayer(TCP).flags
-            if flags & 0x12 == 0x12:
-                return "open", ""
-            elif flags & 0x14 == 0x14:
-                return "closed", ""
-        return "filtered", "Resposta inesperada"
-    except Exception as e:
-        return "unknown", str(e)
+        recv_sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+    except OSError:
+        send_sock.close()
+        raise
+    recv_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+    recv_sock.setblocking(False)
+    sel = selectors.DefaultSelector()
+    sel.register(recv_sock, selectors.EVENT_READ)
 
-def udp_scan(target, port, timeout):
-    """Scan UDP (requer Scapy)"""
+    sport = random.randint(32768, 60999)
+    template = bytearray(_SYN_TEMPLATE)
+    struct.pack_into("!I", template, 24, random.getrandbits(32))
+    # Parte constante dos checksums: só endereços e portas mudam entre pacotes
+    ip_base = _sum16(template[:20])
+    tcp_base = _sum16(template[20:]) + socket.IPPROTO_TCP + 20 + sport
+
+    results = {}
+    report = _reporter(results, on_result)
+    pending = {}  # (ip destino em bytes, porta) -> pares (alvo, porta) que resolvem para ele
+    resolved = {}
+
+    def drain(wait):
+        deadline = time.monotonic() + wait
+        while pending:
+            if stop is not None and stop.is_set():
+                return
+            remaining = deadline - time.monotonic()
+            if not sel.select(max(0.0, remaining)):
+                return
+            while True:
+                try:
+                    pkt = recv_sock.recv(65535)
+                except BlockingIOError:
+                    break
+                ihl = (pkt[0] & 0x0F) * 4
+                if len(pkt) < ihl + 14 or pkt[9] != socket.IPPROTO_TCP:
+                    continue
+                rsport, rdport = _PORTS.unpack_from(pkt, ihl)
+                if rdport != sport:
+                    continue
+                waiting = pending.pop((pkt[12:16], rsport), None)
+                if waiting is None:
+                    continue
+                state = _syn_state(pkt)
+                for pair in waiting:
+                    report(pair, state)
+            if remaining <= 0:
+                return
+
+    try:
+        for i, (target, port) in enumerate(pairs):
+            if stop is not None and stop.is_set():
+                break
+            if target not in resolved:
+                try:
+                    dst = socket.gethostbyname(target)
+                    addrs = socket.inet_aton(_source_ip(dst)) + socket.inet_aton(dst)
+                    resolved[target] = (dst, addrs, _sum16(addrs))
+                except OSError as e:
+                    resolved[target] = e
+            if isinstance(resolved[target], OSError):
+                report((target, port), ("unknown", str(resolved[target])))
+                continue
+            dst, addrs, addr_sum = resolved[target]
+            waiting = pending.get((addrs[4:], port))
+            if waiting is not None:
+                # Outro alvo com o mesmo IP já tem um SYN em andamento para esta porta
+                waiting.append((target, port))
+                continue
+            pkt = bytearray(template)
+            _SYN_FIELDS.pack_into(pkt, 10, _fold(ip_base + addr_sum), addrs[:4], addrs[4:], sport, port)
+            struct.pack_into("!H", pkt, 36, _fold(tcp_base + addr_sum + port))
+            try:
+                send_sock.sendto(pkt, (dst, 0))
+            except OSError as e:
+                report((target, port), ("unknown", str(e)))
+                continue
+            pending[(addrs[4:], port)] = [(target, port)]
+            if i % 256 == 255:
+                drain(0)
+        drain(timeout)
+    finally:
+        sel.close()
+        recv_sock.close()
+        send_sock.close()
+    if stop is not None and stop.is_set():
+        return results  # interrompido: sondagens ainda sem resposta ficam de fora
+    for waiting in pending.values():
+        for pair in waiting:
+            report(pair, ("filtered", "Sem resposta"))
+    return results
+
+def batch_syn_scan(pairs, timeout, on_result=None, stop=None):
+    """Scan TCP SYN em lote: sockets crus se possível, senão sr() do Scapy em blocos de até _SR_CHUNK pares"""
+    if _RAW_SYN:
+        try:
+            return tcp_syn_scan_fast(pairs, timeout, on_result, stop)
+        except OSError:
+            pass  # sem permissão para sockets crus: usa o Scapy
     if not SCAPY_AVAILABLE:
-        return "unknown", "Scapy não disponível"
+        return batch_tcp_connect_scan(pairs, timeout, on_result=on_result, stop=stop)
+    conf.verb = 0
+    results = {}
+    report = _reporter(results, on_result)
+    keys = {}  # (ip, porta) a enviar -> pares (alvo, porta) que resolvem para ele
+    resolved = {}
+    for target, port in pairs:
+        if target not in resolved:
+            try:
+                resolved[target] = socket.gethostbyname(target)
+            except OSError as e:
+                resolved[target] = e
+        ip = resolved[target]
+        if isinstance(ip, OSError):
+            report((target, port), ("unknown", str(ip)))
+            continue
+        keys.setdefault((ip, port), []).append((target, port))
+    sent_keys = list(keys)
+    for i in range(0, len(sent_keys), _SR_CHUNK):
+        if stop is not None and stop.is_set():
+            break
+        chunk = sent_keys[i:i + _SR_CHUNK]
+        pkts = [IP(dst=ip) / TCP(sport=RandShort(), dport=port, flags="S") for ip, port in chunk]
+        try:
+            ans, unans = sr(pkts, timeout=timeout, verbose=0)
+        except Exception as e:
+            for key in chunk:
+                for pair in keys[key]:
+                    report(pair, ("unknown", str(e)))
+            continue
+        for sent, resp in ans:
+            state = _syn_state(bytes(resp))
+            for pair in keys[(sent[IP].dst, sent[TCP].dport)]:
+                report(pair, state)
+        for sent in unans:
+            for pair in keys[(sent[IP].dst, sent[TCP].dport)]:
+                report(pair, ("filtered", "Sem resposta"))
+    return results
+
+def _udp_scan_scapy(target, port, timeout):
+    """Scan UDP (requer Scapy)"""
     try:
         conf.verb = 0
         pkt = IP(dst=target) / UDP(dport=port)
@@ -114,11 +408,137 @@ def udp_scan(target, port, timeout):
             return "open|filtered", "Sem resposta"
         elif resp.haslayer(UDP):
             return "open", ""
+        elif resp.haslayer(ICMP) and int(resp[ICMP].type) == 3 and int(resp[ICMP].code) == 3:
+            return "closed", ""
         else:
             return "filtered", "Provavelmente filtrada"
     except Exception as e:
         return "unknown", str(e)
 
+def _udp_scan_unavailable(target, port, timeout):
+    return "unknown", "Scapy não disponível"
+
+# Resolvido uma única vez na importação: sem Scapy, UDP por sondagem fica indisponível
+udp_scan = _udp_scan_scapy if SCAPY_AVAILABLE else _udp_scan_unavailable
+
+def batch_udp_scan(pairs, timeout, on_result=None, stop=None):
+    """Scan UDP em lote: um socket UDP envia tudo e um socket ICMP cru coleta as respostas (requer root)"""
+    icmp_sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+    try:
+        udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    except OSError:
+        icmp_sock.close()
+        raise
+    sel = selectors.DefaultSelector()
+
+    results = {}
+    report = _reporter(results, on_result)
+    pending = {}  # (ip destino em bytes, porta) -> pares (alvo, porta) que resolvem para ele
+    resolved = {}
+
+    def read_udp():
+        while True:
+            try:
+                _, (ip, port) = udp_sock.recvfrom(65535)
+            except BlockingIOError:
+                return
+            for pair in pending.pop((socket.inet_aton(ip), port), ()):
+                report(pair, ("open", ""))
+
+    def read_icmp():
+        while True:
+            try:
+                pkt = icmp_sock.recv(65535)
+            except BlockingIOError:
+                return
+            # ICMP destino inalcançável (tipo 3) carrega o cabeçalho IP/UDP da sonda original
+            ihl = (pkt[0] & 0x0F) * 4
+            inner = ihl + 8
+            if len(pkt) < inner + 20 or pkt[ihl] != 3 or pkt[inner + 9] != socket.IPPROTO_UDP:
+                continue
+            udp_off = inner + (pkt[inner] & 0x0F) * 4
+            if len(pkt) < udp_off + 4:
+                continue
+            psport, pdport = _PORTS.unpack_from(pkt, udp_off)
+            if psport != sport:
+                continue
+            # Código 3 (porta inalcançável) = fechada; demais códigos = filtrada
+            state = ("closed", "") if pkt[ihl + 1] == 3 else ("filtered", "Provavelmente filtrada")
+            for pair in pending.pop((pkt[inner + 16:inner + 20], pdport), ()):
+                report(pair, state)
+
+    def drain(wait):
+        deadline = time.monotonic() + wait
+        while pending:
+            if stop is not None and stop.is_set():
+                return
+            remaining = deadline - time.monotonic()
+            ready = sel.select(max(0.0, remaining))
+            if not ready:
+                return
+            for key, _ in ready:
+                if key.fileobj is udp_sock:
+                    read_udp()
+                else:
+                    read_icmp()
+            if remaining <= 0:
+                return
+
+    try:
+        udp_sock.bind(("", 0))
+        sport = udp_sock.getsockname()[1]
+        for sock in (icmp_sock, udp_sock):
+            sock.setblocking(False)
+            sel.register(sock, selectors.EVENT_READ)
+        for i, (target, port) in enumerate(pairs):
+            if stop is not None and stop.is_set():
+                break
+            if target not in resolved:
+                try:
+                    resolved[target] = socket.gethostbyname(target)
+                except OSError as e:
+                    resolved[target] = e
+            dst = resolved[target]
+            if isinstance(dst, OSError):
+                report((target, port), ("unknown", str(dst)))
+                continue
+            key = (socket.inet_aton(dst), port)
+            if key in pending:
+                # Outro alvo com o mesmo IP já tem uma sonda em andamento para esta porta
+                pending[key].append((target, port))
+                continue
+            try:
+                udp_sock.sendto(b"", (dst, port))
+            except OSError as e:
+                report((target, port), ("unknown", str(e)))
+                continue
+            pending[key] = [(target, port)]
+            if i % 256 == 255:
+                drain(0)
+        drain(timeout)
+    finally:
+        sel.close()
+        udp_sock.close()
+        icmp_sock.close()
+    if stop is not None and stop.is_set():
+        return results  # interrompido: sondagens ainda sem resposta ficam de fora
+    for waiting in pending.values():
+        for pair in waiting:
+            report(pair, ("open|filtered", "Sem resposta"))
+    return results
+
+async def udp_scan_all(pairs, timeout):
+    """Executa os scans UDP (sr1() bloqueante) concorrentemente no executor do event loop"""
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+
+    async def probe(target, port):
+        async with sem:
+            return await loop.run_in_executor(None, udp_scan, target, port, timeout)
+
+    states = await asyncio.gather(*(probe(*pair) for pair in pairs))
+    return dict(zip(pairs, states))
+
 def main():
     parser = argparse.ArgumentParser(description="MeltScan CLI - Scanner de portas")
     parser.add_argument("target", help="Alvo(s) (IP, lista de IPs ou rede CIDR)")
@@ -150,32 +570,40 @@ def main():
     print(f"Iniciando varredura de {len(targets)} alvo(s) e {len(ports)} porta(s)")
     print("=" * 60)
     
-    results = []
+    pairs = [(t, p) for t in targets for p in ports]
+    scans = {}
+    if args.tcp and args.syn:
+        # Um único lote para todos os alvos
+        for (target, port), res in batch_syn_scan(pairs, args.timeout).items():
+            scans[(target, "TCP", port)] = res
+    elif args.tcp:
+        for (target, port), res in batch_tcp_connect_scan(pairs, args.timeout).items():
+            scans[(target, "TCP", port)] = res
+    if args.udp:
+        try:
+            udp = batch_udp_scan(pairs, args.timeout)
+        except OSError:
+            # Sem socket cru (não root): sondagens individuais via Scapy
+            udp = asyncio.run(udp_scan_all(pairs, args.timeout))
+        for (target, port), res in udp.items():
+            scans[(target, "UDP", port)] = res
     
+    protos = [proto for proto, enabled in (("TCP", args.tcp), ("UDP", args.udp)) if enabled]
+    results = []
     for target in targets:
         print(f"\nAlvo: {target}")
         for port in ports:
-            if args.tcp:
-                if args.syn:
-                    state, info = tcp_syn_scan(target, port, args.timeout)
-                else:
-                    state, info = tcp_connect_scan(target, port, args.timeout)
-                
-                results.append(f"{target}\tTCP\t{port}\t{state}\t{info}")
-                print(f"Porta {port}/TCP: {state} {f'({info})' if info else ''}")
-            
-            if args.udp:
-                state, info = udp_scan(target, port, args.timeout)
-                results.append(f"{target}\tUDP\t{port}\t{state}\t{info}")
-                print(f"Porta {port}/UDP: {state} {f'({info})' if info else ''}")
+            for proto in protos:
+                state, info = scans.get((target, proto, port), ("unknown", "Sem resultado"))
+                results.append(f"{target}\t{proto}\t{port}\t{state}\t{info}")
+                print(f"Porta {port}/{proto}: {state} {f'({info})' if info else ''}")
     
     # Salvar resultados se solicitado
     if args.output:
         try:
-            with open(args.output, 'w') as f:
+            with open(args.output, 'w', buffering=1 << 20) as f:
                 f.write("Alvo\tProtocolo\tPorta\tEstado\tInfo\n")
-                for result in results:
-                    f.write(result + "\n")
+                f.writelines(result + "\n" for result in results)
             print(f"\nResultados salvos em: {args.output}")
         except Exception as e:
             print(f"Erro ao salvar resultados: {e}")
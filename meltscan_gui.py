@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 """
 MeltScan — Scanner de portas (GUI)
-- Scans TCP (connect / syn com Scapy)
+- Scans TCP (connect / syn com sockets crus ou Scapy)
 - Scans UDP (com Scapy, fallback para 'unknown' se não disponível)
 - Exporta resultados para TXT e CSV
 - Presets estilo "nmap" no menu
@@ -13,205 +13,99 @@ Aviso: use apenas em redes/equipamentos que você tem autorização para testar.
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+import asyncio
 import threading
-import socket
-import queue
 import csv
-import re
-import ipaddress
-from typing import List
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, NamedTuple
 
-# Try to import scapy (opcional)
-try:
-    from scapy.all import IP, TCP, UDP, sr1, conf  # type: ignore
-    SCAPY_AVAILABLE = True
-except Exception:
-    SCAPY_AVAILABLE = False
+# Parsers e scans compartilhados com a CLI, que também faz a importação opcional do Scapy
+from meltscan_cli import (
+    SCAPY_AVAILABLE, _connect_state, _new_probe_socket, batch_syn_scan, batch_udp_scan, parse_ports, parse_targets,
+    udp_scan,
+)
+
+# Buffer de escrita das exportações (1 MiB): poucas chamadas write() ao SO
+_EXPORT_BUFFER = 1 << 20
 
 
 # ------------------------------
 # Estruturas
 # ------------------------------
-class ScanResult:
-    def __init__(self, target, proto, port, state, info=""):
-        self.target = target
-        self.proto = proto
-        self.port = port
-        self.state = state
-        self.info = info
+class ScanResult(NamedTuple):
+    target: str
+    proto: str
+    port: int
+    state: str
+    info: str = ""
+    state_pt: str = ""  # estado já traduzido (exibição/exportação)
 
 
 # ------------------------------
 # Tradução e cores
 # ------------------------------
-def traduz_estado(state: str) -> str:
-    mapping = {
-        "open": "Aberta",
-        "closed": "Fechada",
-        "filtered": "Filtrada",
-        "open|filtered": "Aberta/Filtrada",
-        "timeout": "Tempo esgotado",
-        "unknown": "Desconhecida",
-    }
-    return mapping.get(state, state)
-
-
-def cor_estado(state_pt: str) -> str:
-    return {
-        "Aberta": "lightgreen",
-        "Fechada": "salmon",
-        "Filtrada": "khaki",
-        "Aberta/Filtrada": "orange",
-        "Tempo esgotado": "lightgray",
-        "Desconhecida": "white",
-    }.get(state_pt, "white")
+_ESTADO_MAP = {
+    "open": "Aberta",
+    "closed": "Fechada",
+    "filtered": "Filtrada",
+    "open|filtered": "Aberta/Filtrada",
+    "timeout": "Tempo esgotado",
+    "unknown": "Desconhecida",
+}
+
+_COR_MAP = {
+    "Aberta": "lightgreen",
+    "Fechada": "salmon",
+    "Filtrada": "khaki",
+    "Aberta/Filtrada": "orange",
+    "Tempo esgotado": "lightgray",
+    "Desconhecida": "white",
+}
+
+# Linhas inseridas na tabela por ciclo do _drain (mantém a interface responsiva)
+_DRAIN_BATCH = 500
 
 
 # ------------------------------
-# Parser de alvos e portas
+# Scans
 # ------------------------------
-def parse_targets(text: str) -> List[str]:
-    """
-    Aceita múltiplos alvos separados por vírgula, nova linha, ou ponto e vírgula.
-    Suporta IPs simples e endereços no formato CIDR (ex.: 192.168.1.0/28).
-    Retorna lista de endereços (IPv4/IPv6) como strings.
-    """
-    raw = re.split(r"[\n,;]+", text.strip())
-    out = []
-    for token in raw:
-        t = token.strip()
-        if not t:
-            continue
-        if "/" in t:
-            try:
-                net = ipaddress.ip_network(t, strict=False)
-                for ip in net.hosts():
-                    out.append(str(ip))
-            except Exception:
-                try:
-                    ipaddress.ip_address(t)
-                    out.append(t)
-                except Exception:
-                    continue
-        else:
-            out.append(t)
-    return out
-
-
-def parse_ports(text: str) -> List[int]:
+async def tcp_connect_scan_async(target, port, timeout):
     """
-    Analisa entradas como: 22,80,443,1000-1010 -> lista de ints
-    Ignora valores inválidos.
+    Versão não bloqueante do connect scan: milhares de sondagens podem ficar
+    em andamento no mesmo event loop, sem uma thread por sondagem.
     """
-    if not text:
-        return []
-    parts = re.split(r"[\s,;]+", text.strip())
-    ports = set()
-    for p in parts:
-        if not p:
-            continue
-        if "-" in p:
-            try:
-                a, b = p.split("-")
-                a = int(a)
-                b = int(b)
-                if a < 1:
-                    a = 1
-                if b > 65535:
-                    b = 65535
-                for port in range(min(a, b), max(a, b) + 1):
-                    ports.add(port)
-            except Exception:
-                continue
-        else:
-            try:
-                val = int(p)
-                if 1 <= val <= 65535:
-                    ports.add(val)
-            except Exception:
-                continue
-    return sorted(list(ports))
-
-
-# ------------------------------
-# Scans
-# ------------------------------
-def tcp_connect_scan(target, port, timeout):
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(timeout)
-        result = sock.connect_ex((target, port))
-        sock.close()
-        if result == 0:
-            return "open", ""
-        else:
-            return "closed", ""
-    except Exception as e:
+        sock = _new_probe_socket(timeout)
+    except OSError as e:
         return "unknown", str(e)
-
-
-def tcp_syn_scan(target, port, timeout):
-    if not SCAPY_AVAILABLE:
-        return tcp_connect_scan(target, port, timeout)
-    try:
-        conf.verb = 0
-        pkt = IP(dst=target) / TCP(dport=port, flags="S")
-        resp = sr1(pkt, timeout=timeout)
-        if resp is None:
-            return "filtered", "Sem resposta"
-        if resp.haslayer(TCP):
-            flags = resp.getlayer(TCP).flags
-            if flags & 0x12 == 0x12:
-                return "open", ""
-            elif flags & 0x14 == 0x14:
-                return "closed", ""
-        return "filtered", "Resposta inesperada"
-    except Exception as e:
-        return "unknown", str(e)
-
-
-def udp_scan(target, port, timeout):
-    if not SCAPY_AVAILABLE:
-        return "unknown", "Scapy não disponível"
+    sock.setblocking(False)
     try:
-        conf.verb = 0
-        pkt = IP(dst=target) / UDP(dport=port)
-        resp = sr1(pkt, timeout=timeout)
-        if resp is None:
-            return "open|filtered", "Sem resposta"
-        elif resp.haslayer(UDP):
-            return "open", ""
-        else:
-            return "filtered", "Provavelmente filtrada"
-    except Exception as e:
-        return "unknown", str(e)
+        await asyncio.wait_for(asyncio.get_running_loop().sock_connect(sock, (target, port)), timeout)
+        return "open", ""
+    except asyncio.TimeoutError:
+        return "filtered", "Sem resposta"
+    except OSError as e:
+        return _connect_state(e.errno, str(e))
+    finally:
+        sock.close()
 
 
 # ------------------------------
-# Worker
+# Sondagens (coroutines)
 # ------------------------------
-def worker(taskq: queue.Queue, results: List[ScanResult], settings, logfn, stop_event: threading.Event):
-    while not stop_event.is_set():
-        try:
-            target, proto, port = taskq.get_nowait()
-        except queue.Empty:
-            break
-        if stop_event.is_set():
-            taskq.task_done()
-            break
-        if proto == "tcp":
-            if settings["tcp_mode"] == "syn":
-                state, info = tcp_syn_scan(target, port, settings["timeout"])
-            else:
-                state, info = tcp_connect_scan(target, port, settings["timeout"])
-        else:
-            state, info = udp_scan(target, port, settings["timeout"])
-        results.append(ScanResult(target, proto, port, state, info))
-        try:
-            logfn(target, proto, port, state, info)
-        except Exception:
-            pass
-        taskq.task_done()
+async def probe(target, proto, port, settings):
+    if proto == "tcp":
+        return await tcp_connect_scan_async(target, port, settings["timeout"])
+    # UDP depende do sr1() bloqueante do Scapy: roda no executor do loop
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, udp_scan, target, port, settings["timeout"])
+
+
+async def batch_probe(scan, pairs, settings, on_result, stop):
+    """Roda um scan em lote (batch_syn_scan / batch_udp_scan) sobre todos os pares, no executor do loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, scan, pairs, settings["timeout"], on_result, stop)
 
 
 # ------------------------------
@@ -293,6 +187,8 @@ class MeltScanApp:
             self.tree.heading(col, text=col.capitalize())
             self.tree.column(col, width=140, anchor="center")
         self.tree.grid(row=4, column=0, columnspan=6, sticky="nsew", pady=5)
+        for estado_pt, cor in _COR_MAP.items():
+            self.tree.tag_configure(estado_pt, background=cor)
 
         vsb = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
         vsb.grid(row=4, column=6, sticky="ns")
@@ -308,9 +204,15 @@ class MeltScanApp:
 
         # Controle
         self.scanning = False
-        self.results: List[ScanResult] = []
+        self.results: Deque[ScanResult] = deque()
+        self._loop = None
+        self._tasks = []
         self.stop_event = threading.Event()
 
+        # Linhas aguardando inserção na tabela (produzidas pela thread de scan)
+        self._pending = deque()
+        self.root.after(100, self._drain)
+
     # ---------- Presets ----------
     def preset_quick(self):
         self.ports_entry.delete(0, "end")
@@ -333,14 +235,15 @@ class MeltScanApp:
         self.tcp_mode.set("syn")
 
     # ---------- Logging ----------
-    def log_result(self, target, proto, port, state, info):
-        estado_pt = traduz_estado(state)
-        cor = cor_estado(estado_pt)
-        self.root.after(0, lambda: self._insert_tree(target, proto, port, estado_pt, info, cor))
+    def log_result(self, r: ScanResult):
+        self._pending.append((r.target, r.proto, r.port, r.state_pt, r.info))
 
-    def _insert_tree(self, target, proto, port, estado_pt, info, cor):
-        self.tree.insert("", "end", values=(target, proto, port, estado_pt, info), tags=(estado_pt,))
-        self.tree.tag_configure(estado_pt, background=cor)
+    def _drain(self):
+        """Insere na tabela até _DRAIN_BATCH linhas pendentes; volta logo se ainda sobrarem"""
+        for _ in range(min(_DRAIN_BATCH, len(self._pending))):
+            target, proto, port, estado_pt, info = self._pending.popleft()
+            self.tree.insert("", "end", values=(target, proto, port, estado_pt, info), tags=(estado_pt,))
+        self.root.after(10 if self._pending else 100, self._drain)
 
     # ---------- Controle ----------
     def start_scan(self):
@@ -358,19 +261,20 @@ class MeltScanApp:
             return
 
         self.clear_results()
+        # Deque novo por varredura: resultados atrasados de um scan parado não vazam para este
+        self.results = deque()
         self.scanning = True
-        self.stop_event.clear()
         self.start_btn.config(state="disabled")
         self.stop_btn.config(state="normal")
         self.status_var.set("Varredura em andamento...")
 
-        taskq = queue.Queue()
+        tasks = []
         for t in targets:
             for p in ports:
                 if self.tcp_var.get():
-                    taskq.put((t, "tcp", p))
+                    tasks.append((t, "tcp", p))
                 if self.udp_var.get():
-                    taskq.put((t, "udp", p))
+                    tasks.append((t, "udp", p))
 
         settings = {"timeout": float(self.timeout_spin.get()), "tcp_mode": self.tcp_mode.get()}
         try:
@@ -378,21 +282,80 @@ class MeltScanApp:
         except Exception:
             num_threads = 50
 
-        threading.Thread(target=self.run_workers, args=(taskq, settings, num_threads), daemon=True).start()
-
-    def run_workers(self, taskq, settings, num_threads):
-        threads = []
-        for _ in range(max(1, min(500, num_threads))):
-            th = threading.Thread(
-                target=worker,
-                args=(taskq, self.results, settings, self.log_result, self.stop_event),
-            )
-            th.start()
-            threads.append(th)
-        for th in threads:
-            th.join()
+        # Um Event por varredura: um lote antigo ainda em execução continua parado
+        self.stop_event = threading.Event()
+        threading.Thread(target=self.run_workers, args=(tasks, settings, num_threads, self.stop_event), daemon=True).start()
+
+    def run_workers(self, tasks, settings, num_threads, stop):
+        asyncio.run(self._run_async(tasks, settings, num_threads, stop))
         self.root.after(0, self.scan_done)
 
+    async def _run_async(self, tasks, settings, num_threads, stop):
+        num_threads = max(1, min(500, num_threads))
+        loop = asyncio.get_running_loop()
+        # Threads só são criadas sob demanda, para os lotes SYN/UDP e as sondagens via Scapy
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=num_threads))
+        # Deque desta varredura: recebe cada resultado assim que chega, e a
+        # exportação já o enxerga durante o scan
+        results = self.results
+
+        async def worker(jobs):
+            # Todos os workers consomem o mesmo iterador: no máximo num_threads
+            # sondagens em andamento, sem uma Task por (alvo, proto, porta)
+            for target, proto, port in jobs:
+                state, info = await probe(target, proto, port, settings)
+                self._record(results, target, proto, port, state, info)
+
+        async def scan_each(jobs):
+            jobs = iter(jobs)
+            await asyncio.gather(*(worker(jobs) for _ in range(num_threads)))
+
+        def recorder(proto):
+            def record(pair, res):
+                # Chamado na thread do lote: após "Parar", respostas atrasadas são descartadas
+                if not stop.is_set():
+                    self._record(results, pair[0], proto, pair[1], *res)
+            return record
+
+        async def scan_udp(pairs):
+            try:
+                await batch_probe(batch_udp_scan, pairs, settings, recorder("udp"), stop)
+            except OSError:
+                # Sem socket cru (não root): sondagens individuais via Scapy
+                await scan_each((t, "udp", p) for t, p in pairs)
+
+        syn = settings["tcp_mode"] == "syn"
+        syn_pairs = [(t, p) for t, proto, p in tasks if proto == "tcp"] if syn else []
+        udp_pairs = [(t, p) for t, proto, p in tasks if proto == "udp"]
+        coros = [scan_each(job for job in tasks if job[1] == "tcp" and not syn)]
+        if syn_pairs:
+            coros.append(batch_probe(batch_syn_scan, syn_pairs, settings, recorder("tcp"), stop))
+        if udp_pairs:
+            coros.append(scan_udp(udp_pairs))
+
+        self._tasks = [loop.create_task(c) for c in coros]
+        self._loop = loop
+        if stop.is_set():  # "Parar" clicado antes das tarefas existirem
+            self._cancel_tasks()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._loop is loop:
+            self._loop = None
+            self._tasks = []
+
+    def _cancel_tasks(self):
+        for task in self._tasks:
+            task.cancel()
+
+    def _record(self, results, target, proto, port, state, info):
+        r = ScanResult(target, proto, port, state, info, _ESTADO_MAP.get(state, state))
+        results.append(r)
+        if results is not self.results:  # varredura anterior, já substituída
+            return
+        try:
+            self.log_result(r)
+        except Exception:
+            pass
+
     def scan_done(self):
         self.scanning = False
         self.start_btn.config(state="normal")
@@ -402,16 +365,19 @@ class MeltScanApp:
     def stop_scan(self):
         if not self.scanning:
             return
+        self.scanning = False
         self.stop_event.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._cancel_tasks)
         self.status_var.set("Interrompido")
         self.start_btn.config(state="normal")
         self.stop_btn.config(state="disabled")
-        self.scanning = False
 
     def clear_results(self):
         """Limpa tabela e lista interna de resultados"""
         self.tree.delete(*self.tree.get_children())
-        self.results = []
+        self._pending.clear()
+        self.results.clear()
         self.status_var.set("Resultados limpos")
 
     # ---------- Exportação ----------
@@ -423,9 +389,11 @@ class MeltScanApp:
         if not filepath:
             return
         try:
-            with open(filepath, "w", encoding="utf-8") as f:
-                for r in self.results:
-                    f.write(f"{r.target}\t{r.proto}\t{r.port}\t{traduz_estado(r.state)}\t{r.info}\n")
+            with open(filepath, "w", encoding="utf-8", buffering=_EXPORT_BUFFER) as f:
+                f.writelines(
+                    f"{r.target}\t{r.proto}\t{r.port}\t{r.state_pt}\t{r.info}\n"
+                    for r in list(self.results)  # cópia: o scan pode estar acrescentando
+                )
             messagebox.showinfo("Sucesso", f"Resultados exportados para {filepath}")
         except Exception as e:
             messagebox.showerror("Erro", str(e))
@@ -438,11 +406,12 @@ class MeltScanApp:
         if not filepath:
             return
         try:
-            with open(filepath, "w", newline="", encoding="utf-8") as f:
+            with open(filepath, "w", newline="", encoding="utf-8", buffering=_EXPORT_BUFFER) as f:
                 writer = csv.writer(f)
                 writer.writerow(["Alvo", "Protocolo", "Porta", "Estado", "Info"])
-                for r in self.results:
-                    writer.writerow([r.target, r.proto, r.port, traduz_estado(r.state), r.info])
+                writer.writerows(
+                    [(r.target, r.proto, r.port, r.state_pt, r.info) for r in list(self.results)]
+                )
             messagebox.showinfo("Sucesso", f"Resultados exportados para {filepath}")
         except Exception as e:
             messagebox.showerror("Erro", str(e))